@@ -1,6 +1,10 @@
 from pydantic import BaseModel
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 import asyncio
+import concurrent.futures
+import importlib
+import inspect
 import time
 import sys
 import os
@@ -8,18 +12,124 @@ import os
 # Add the parking_system package to the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from parking_system.agents.Driver import Driver
-from parking_system.agents.ParkingManager import ParkingManager
-from parking_system.agents.ParkingSpotModule import ParkingSpotModule
-from parking_system.agents.ParkingZoneManager import ParkingZoneManager
+from parking_system.api.admission import RateLimiter, WorkQueues
+from parking_system.api.mqtt_ingestion import SensorSubscriber
+from parking_system.api import trace
+from parking_system import profiling
+from parking_system.constants import (SENSOR_RATE_LIMIT, DRIVER_RATE_LIMIT, AGENT_START_CONCURRENCY,
+                                      BEHAVIOUR_TIMEOUT)
 
 app = FastAPI()
 
 agents = {}  # to keep track of created agents
+default_manager_id = "pm1"  # drivers talk to the router instead once one is created
+agent_start_slots = None  # limits the agents connecting to the XMPP server at once
+agent_start_tasks = set()  # keeps background connections and provisioning referenced until they finish
 
 AVAILABLE_ENVIRONMENTS = ["Outdoor", "Indoor", "Both", "Indoor-Preferred", "Outdoor-Preferred"]
 AVAILABLE_PRICING_OPTIONS = ["Low", "Medium", "High"]
 
+# Sensor readings are coalesced (the latest reading wins), driver requests are refused when the queue is full
+sensor_work = WorkQueues(drop_oldest=True)
+driver_work = WorkQueues()
+# Set PARKING_RATE_LIMIT_SCALE to scale the rate limits (e.g. 10 for a 10x replay, 0 to turn them off)
+rate_limit_scale = float(os.environ.get('PARKING_RATE_LIMIT_SCALE', '1'))
+sensor_limiter = RateLimiter(*SENSOR_RATE_LIMIT, scale=rate_limit_scale)
+driver_limiter = RateLimiter(*DRIVER_RATE_LIMIT, scale=rate_limit_scale)
+
+
+# Set PARKING_TRACE_FILE to record incoming requests, and PARKING_RANDOM_SEED to make the agents deterministic
+recorder = trace.TraceRecorder(os.environ['PARKING_TRACE_FILE']) if os.environ.get('PARKING_TRACE_FILE') else None
+random_seed = os.environ.get('PARKING_RANDOM_SEED')
+
+# Set PARKING_PROFILING=1 to time agent behaviours and monitor event loop lag
+profiler = profiling.Profiler() if os.environ.get('PARKING_PROFILING', '0') != '0' else None
+
+
+def record(kind, *fields):
+    if recorder is not None:
+        recorder.record(kind, *fields)
+
+
+def agent_seed(agent_id):
+    """Derive a per-agent seed so each agent's random stream does not depend on creation order"""
+    return f"{random_seed}:{agent_id}" if random_seed is not None else None
+
+
+def agent_class(name):
+    """Import an agent class on first use, so the server starts without loading spade"""
+    return getattr(importlib.import_module(f"parking_system.agents.{name}"), name)
+
+
+async def start_agent(agent_id, agent):
+    """
+    Register an agent and connect it to the XMPP server in the background, unless
+    PARKING_LAZY_AGENT_START=0. Behaviours added before the connection completes start with the agent.
+    Agents that fail to connect are unregistered; returns False when the connection is awaited and fails.
+    """
+    global agent_start_slots
+    agents[agent_id] = agent
+    if os.environ.get('PARKING_LAZY_AGENT_START', '1') == '0':
+        try:
+            await connect_agent(agent)
+        except Exception as e:
+            unregister_agent(agent_id, agent)
+            print(f"Error starting agent {agent_id}: {e}")
+            return False
+        return True
+
+    if agent_start_slots is None:
+        agent_start_slots = asyncio.Semaphore(AGENT_START_CONCURRENCY)
+
+    async def connect():
+        async with agent_start_slots:
+            try:
+                await connect_agent(agent)
+            except Exception as e:
+                unregister_agent(agent_id, agent)
+                print(f"Error starting agent {agent_id}: {e}")
+
+    keep_task(asyncio.ensure_future(connect()))
+    return True
+
+
+def unregister_agent(agent_id, agent):
+    # Leave an agent registered again under the same id in place
+    if agents.get(agent_id) is agent:
+        del agents[agent_id]
+
+
+def keep_task(task):
+    agent_start_tasks.add(task)
+    task.add_done_callback(agent_start_tasks.discard)
+
+
+async def connect_agent(agent):
+    """
+    Start an agent and wait until it is connected. spade starts agents on its container loop and,
+    when called from another loop such as the API's, returns a concurrent future instead of a coroutine.
+    """
+    started = agent.start()
+    if isinstance(started, concurrent.futures.Future):
+        await asyncio.wrap_future(started)
+    elif inspect.isawaitable(started):
+        await started
+
+
+def too_many_requests(limiter, key):
+    retry_after = max(1, round(limiter.retry_after(key)))
+    return JSONResponse(status_code=429, content={"Error": "Too many requests"},
+                        headers={"Retry-After": str(retry_after)})
+
+
+def overloaded():
+    return JSONResponse(status_code=503, content={"Error": "Server overloaded"}, headers={"Retry-After": "1"})
+
+
+def agent_not_started():
+    return JSONResponse(status_code=503, content={"Error": "Agent could not be started"},
+                        headers={"Retry-After": "1"})
+
 
 @app.get("/parking_preferences")
 async def get_available_parking_preferences():
@@ -35,10 +145,12 @@ class SpotData(BaseModel):
 async def create_spot(pmodule_id: str, zone_id: str, spot_data: SpotData):
     lat = spot_data.lat
     lon = spot_data.lon
+    record(trace.CREATE_SPOT, pmodule_id, zone_id, lat, lon)
 
-    spot = ParkingSpotModule(f"{pmodule_id}@isep.lan", "agent_password", f"{zone_id}@isep.lan", lat, lon)
-    await spot.start()
-    agents[pmodule_id] = spot
+    spot = agent_class("ParkingSpotModule")(f"{pmodule_id}@isep.lan", "agent_password", f"{zone_id}@isep.lan",
+                                            lat, lon, seed=agent_seed(pmodule_id))
+    if not await start_agent(pmodule_id, spot):
+        return agent_not_started()
     return {"Agent": pmodule_id, "Status": "Created"}
 
 
@@ -49,35 +161,171 @@ class ExecuteBehaviourRequest(BaseModel):
 @app.post("/parking_module/{pmodule_id}")
 async def send_sonar(pmodule_id: str, request: ExecuteBehaviourRequest):
     sonar_value = request.sonar_value
+    record(trace.SONAR, pmodule_id, sonar_value)
     if pmodule_id in agents:
-        asyncio.create_task(agents[pmodule_id].execute_behaviour(sonar_value))
-        return {"Agent": pmodule_id, "Behaviour": "OneShotBehaviour Executed"}
+        if not sensor_limiter.try_acquire(pmodule_id):
+            return too_many_requests(sensor_limiter, pmodule_id)
+        if not sensor_work.submit(pmodule_id, lambda: agents[pmodule_id].execute_behaviour(sonar_value)):
+            return overloaded()
+        # The reading is handled later and may be replaced by a newer one from the same module
+        return {"Agent": pmodule_id, "Reading": "Queued"}
     else:
         return {"Error": "No such agent exists"}
 
 
+async def ingest_sonar(zone_id: str, pmodule_id: str, sonar_value: int):
+    """Route a sonar reading received over MQTT to its parking spot agent"""
+    record(trace.SONAR, pmodule_id, sonar_value)
+    if pmodule_id not in agents:
+        return
+    # Only accept readings published under the zone the module belongs to
+    if agents[pmodule_id].manager_jid != f"{zone_id}@isep.lan":
+        print(f"Ignoring reading from {pmodule_id} published under zone {zone_id}")
+        return
+    if sensor_limiter.try_acquire(pmodule_id):
+        sensor_work.submit(pmodule_id, lambda: agents[pmodule_id].execute_behaviour(sonar_value))
+
+
+sensor_subscriber = SensorSubscriber(ingest_sonar)
+
+
+@app.on_event("startup")
+async def start_sensor_subscriber():
+    if os.environ.get('MQTT_SENSOR_INGESTION', '1') != '0':
+        await sensor_subscriber.start()
+
+
+@app.on_event("startup")
+async def start_profiler():
+    if profiler is not None:
+        profiler.install()
+        profiler.start_lag_monitor()
+
+
+@app.get("/debug/behaviours")
+async def get_behaviour_stats():
+    if profiler is None:
+        return {"Error": "Profiling is disabled"}
+    return profiler.report()
+
+
+@app.get("/debug/profile")
+async def get_stack_samples(seconds: float = 5.0, thread: str = "agents"):
+    """
+    Sample the stacks of the agent loop thread (or of the API loop with thread=api) for a few seconds
+    and return them in folded (flame graph) format
+    """
+    if profiler is None:
+        return {"Error": "Profiling is disabled"}
+    if thread not in ("agents", "api"):
+        return {"Error": "thread must be 'agents' or 'api'"}
+    thread_id = await profiler.agent_thread_id() if thread == "agents" else None
+    return PlainTextResponse(await profiling.sample_stacks(min(seconds, 60.0), thread_id=thread_id))
+
+
+@app.on_event("startup")
+async def start_provisioning():
+    # Set PARKING_PROVISION_FILE to a trace whose agent creations are replayed at startup
+    if os.environ.get('PARKING_PROVISION_FILE'):
+        keep_task(asyncio.ensure_future(provision_agents(os.environ['PARKING_PROVISION_FILE'])))
+
+
+async def provision_agents(path):
+    """Create the agents recorded in a trace, while the server already accepts requests"""
+    try:
+        await create_agents(path)
+    except Exception as e:
+        print(f"Error provisioning agents from {path}: {e}")
+    print(f"Provisioned {len(agents)} agents")
+
+
+async def create_agents(path):
+    for event in trace.read_trace(path):
+        fields = event.fields
+        if event.kind == trace.CREATE_MANAGER:
+            await create_manager(*fields)
+        elif event.kind == trace.CREATE_ROUTER:
+            await create_router(*fields)
+        elif event.kind == trace.CREATE_REGION:
+            await create_region(*fields)
+        elif event.kind == trace.CREATE_ZONE:
+            await create_zone(*fields)
+        elif event.kind == trace.CREATE_SPOT:
+            pmodule_id, zone_id, lat, lon = fields
+            await create_spot(pmodule_id, zone_id, SpotData(lat=lat, lon=lon))
+        elif event.kind == trace.CREATE_DRIVER:
+            await create_driver(*fields)
+        # Let requests in between creations
+        await asyncio.sleep(0)
+
+
+@app.on_event("shutdown")
+async def stop_sensor_subscriber():
+    await sensor_subscriber.stop()
+    if profiler is not None:
+        await profiler.stop()
+    await sensor_work.close()
+    await driver_work.close()
+    if recorder is not None:
+        recorder.close()
+
+
 @app.post("/parking_zone/{zone_id}/{manager_id}")
 async def create_zone(zone_id: str, manager_id: str, lat: float, lon: float, price_hour: float, environment: str):
-    zone = ParkingZoneManager(f"{zone_id}@isep.lan", "agent_password", f"{manager_id}@isep.lan", lat, lon, price_hour,
-                              environment, zone_id)
-    await zone.start()
-    agents[zone_id] = zone
+    record(trace.CREATE_ZONE, zone_id, manager_id, lat, lon, price_hour, environment)
+    zone = agent_class("ParkingZoneManager")(f"{zone_id}@isep.lan", "agent_password", f"{manager_id}@isep.lan", lat,
+                                             lon, price_hour, environment, zone_id, seed=agent_seed(zone_id))
+    if not await start_agent(zone_id, zone):
+        return agent_not_started()
     return {"Agent": zone_id, "Status": "Created"}
 
 
 @app.post("/parking_manager/{manager_id}")
 async def create_manager(manager_id: str):
-    manager = ParkingManager(f"{manager_id}@isep.lan", "agent_password")
-    await manager.start()
-    agents[manager_id] = manager
+    record(trace.CREATE_MANAGER, manager_id)
+    manager = agent_class("ParkingManager")(f"{manager_id}@isep.lan", "agent_password")
+    if not await start_agent(manager_id, manager):
+        return agent_not_started()
+    return {"Agent": manager_id, "Status": "Created"}
+
+
+@app.post("/parking_router/{router_id}")
+async def create_router(router_id: str):
+    global default_manager_id
+    record(trace.CREATE_ROUTER, router_id)
+    router = agent_class("ParkingRouter")(f"{router_id}@isep.lan", "agent_password")
+    if not await start_agent(router_id, router):
+        return agent_not_started()
+    default_manager_id = router_id
+    return {"Agent": router_id, "Status": "Created"}
+
+
+@app.post("/parking_region/{manager_id}/{router_id}")
+async def create_region(manager_id: str, router_id: str, lat: float, lon: float):
+    if router_id not in agents:
+        return {"Error": "No such agent exists"}
+    record(trace.CREATE_REGION, manager_id, router_id, lat, lon)
+    manager = agent_class("ParkingManager")(f"{manager_id}@isep.lan", "agent_password",
+                                            router_jid=f"{router_id}@isep.lan")
+    if not await start_agent(manager_id, manager):
+        return agent_not_started()
+    agents[router_id].add_region(f"{manager_id}@isep.lan", lat, lon)
     return {"Agent": manager_id, "Status": "Created"}
 
 
 @app.get("/driver/{driver_id}")
 async def execute_behaviour(driver_id: str, lat: float, lon: float, environment: str, pricing: str):
+    record(trace.DRIVER_REQUEST, driver_id, lat, lon, environment, pricing)
     if driver_id in agents:
-        asyncio.create_task(agents[driver_id].execute_behaviour2(lat, lon, environment, pricing))
+        if not driver_limiter.try_acquire(driver_id):
+            return too_many_requests(driver_limiter, driver_id)
+        if not driver_work.submit(driver_id, lambda: agents[driver_id].execute_behaviour2(lat, lon, environment, pricing)):
+            return overloaded()
+        deadline = time.monotonic() + BEHAVIOUR_TIMEOUT
         while not agents[driver_id].has_park:
+            if time.monotonic() >= deadline:
+                return JSONResponse(status_code=504, content={"Error": "No parking spot assigned in time"},
+                                    headers={"Retry-After": str(BEHAVIOUR_TIMEOUT)})
             await asyncio.sleep(0.1)
 
         return {"zone": agents[driver_id].parking_zone_jid, "module_id": agents[driver_id].parking_spot_jid,
@@ -89,13 +337,15 @@ async def execute_behaviour(driver_id: str, lat: float, lon: float, environment:
 
 
 @app.post("/driver/{driver_id}")
-async def create_driver(driver_id: str):
-    driver = Driver(f"{driver_id}@isep.lan", "agent_password", "pm1@isep.lan")
-    await driver.start()
-    agents[driver_id] = driver
+async def create_driver(driver_id: str, manager_id: str = None):
+    manager_id = manager_id or default_manager_id
+    record(trace.CREATE_DRIVER, driver_id, manager_id)
+    driver = agent_class("Driver")(f"{driver_id}@isep.lan", "agent_password", f"{manager_id}@isep.lan")
+    if not await start_agent(driver_id, driver):
+        return agent_not_started()
     return {"Agent": driver_id, "Status": "Created"}
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get('PORT', '8000')))
\ No newline at end of file
@@ -1,9 +1,3 @@
-import sys
-import os
-
-# Add the parent directory to the path to import constants
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour, OneShotBehaviour
 from spade.message import Message
@@ -94,4 +88,5 @@ class Driver(Agent):
     async def execute_behaviour2(self, lat: float, lon: float, environment: str, price: str):
         """Execute the parking request behaviour"""
         request_behaviour = self.RequestParkingBehaviour(self, lat, lon, environment, price)
-        self.add_behaviour(request_behaviour)
\ No newline at end of file
+        self.add_behaviour(request_behaviour)
+        return request_behaviour
\ No newline at end of file
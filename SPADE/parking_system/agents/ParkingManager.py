@@ -1,14 +1,8 @@
-import sys
-import os
-from math import radians, sin, cos, sqrt, atan2
-
-# Add the parent directory to the path to import constants
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from spade.agent import Agent
-from spade.behaviour import CyclicBehaviour
+from spade.behaviour import CyclicBehaviour, PeriodicBehaviour
 from spade.message import Message
-from parking_system.constants import AVAILABLE_ENVIRONMENTS, AVAILABLE_PRICING_OPTIONS
+from parking_system.constants import AVAILABLE_ENVIRONMENTS, AVAILABLE_PRICING_OPTIONS, REGION_SUMMARY_PERIOD
+from parking_system.geo import calculate_distance
 
 
 class ParkingManager(Agent):
@@ -45,6 +39,17 @@ class ParkingManager(Agent):
                         response_msg = Message(to=sender_jid)
                         response_msg.body = "NoSpotAvailable"
                         await self.send(response_msg)
+                elif msg.body.startswith("Query"):
+                    # Request forwarded by the router: "Query <request id> <environment> <pricing> <lat> <lon>"
+                    request_id, request = msg.body.split(" ", 2)[1:]
+                    environment, pricing, lat, lon = self.extract_request_params(f"Request {request}")
+                    best_match = self.find_best_parking_zone(environment, pricing, lat, lon)
+                    response_msg = Message(to=sender_jid)
+                    if best_match:
+                        response_msg.body = f"Candidate {request_id} {best_match[0]} {best_match[1]}"
+                    else:
+                        response_msg.body = f"Candidate {request_id} None"
+                    await self.send(response_msg)
                 else:
                     # Process the message and extract the number of vacant spaces and additional information
                     try:
@@ -81,6 +86,11 @@ class ParkingManager(Agent):
 
         def find_vacant_parking_spot(self, environment=None, pricing=None, lat=None, lon=None):
             """Find the best vacant parking spot based on criteria"""
+            best_match = self.find_best_parking_zone(environment, pricing, lat, lon)
+            return best_match[0] if best_match else None
+
+        def find_best_parking_zone(self, environment=None, pricing=None, lat=None, lon=None):
+            """Find the JID and score of the best parking zone with vacant spaces"""
             matched_spots = []
 
             # Evaluate all parking zones with vacant spaces
@@ -102,7 +112,7 @@ class ParkingManager(Agent):
             if matched_spots:
                 # Sort the matched spots based on the score in descending order
                 matched_spots.sort(key=lambda x: x[1], reverse=True)
-                return matched_spots[0][0][0]  # Return the JID of the best match
+                return matched_spots[0][0][0], matched_spots[0][1]  # Return the JID and score of the best match
 
             return None
 
@@ -162,29 +172,33 @@ class ParkingManager(Agent):
 
         def calculate_distance(self, lat1, lon1, lat2, lon2):
             """Calculate the distance between two locations using the Haversine formula"""
-            # Convert degrees to radians
-            lat1_rad = radians(lat1)
-            lon1_rad = radians(lon1)
-            lat2_rad = radians(lat2)
-            lon2_rad = radians(lon2)
+            return calculate_distance(lat1, lon1, lat2, lon2)
 
-            # Earth's radius in kilometers
-            earth_radius = 6371.0
+    class SummaryBehaviour(PeriodicBehaviour):
+        """
+        Behaviour to send the region's vacancy summary to the router
+        """
 
-            # Haversine formula
-            dlon = lon2_rad - lon1_rad
-            dlat = lat2_rad - lat1_rad
-            a = sin(dlat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2) ** 2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-            distance = earth_radius * c
+        def __init__(self, owner, period):
+            super().__init__(period=period)
+            self.owner = owner
 
-            return distance
+        async def run(self):
+            vacant_spaces = sum(self.owner.vacant_spaces.values())
+            vacant_zones = sum(1 for count in self.owner.vacant_spaces.values() if count > 0)
+            msg = Message(to=self.owner.router_jid)
+            msg.body = f"Summary {vacant_spaces} {vacant_zones}"
+            await self.send(msg)
 
-    def __init__(self, jid: str, password: str, verify_security: bool = False):
+    def __init__(self, jid: str, password: str, verify_security: bool = False, router_jid=None):
         super().__init__(jid, password, verify_security)
         self.vacant_spaces = {}  # Dictionary to store vacant space counts for parking zone managers
+        self.router_jid = router_jid  # Set when this manager owns a region behind a ParkingRouter
 
     async def setup(self):
         """Agent setup - add the listening behaviour"""
         listen_behaviour = self.ListenBehaviour(self)
-        self.add_behaviour(listen_behaviour)
\ No newline at end of file
+        self.add_behaviour(listen_behaviour)
+        if self.router_jid:
+            summary_behaviour = self.SummaryBehaviour(self, REGION_SUMMARY_PERIOD)
+            self.add_behaviour(summary_behaviour)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import time
+from itertools import count
+
+from spade.agent import Agent
+from spade.behaviour import CyclicBehaviour
+from spade.message import Message
+from parking_system.constants import REGION_BORDER_MARGIN, ROUTER_RESPONSE_TIMEOUT
+from parking_system.geo import calculate_distance
+
+
+class ParkingRouter(Agent):
+    """
+    Agent that routes driver requests to the regional parking managers covering their location
+    """
+
+    class RouteBehaviour(CyclicBehaviour):
+        """
+        Behaviour to forward driver requests to regional managers and pick the best candidate
+        """
+
+        def __init__(self, owner):
+            super().__init__()
+            self.owner = owner
+            self.request_ids = count(1)
+            self.pending = {}  # request id -> (driver jid, deadline, regions still to answer, best candidate)
+
+        async def run(self):
+            """Main behaviour loop"""
+            msg = await self.receive(timeout=1)
+
+            if msg:
+                sender_jid = str(msg.sender)
+
+                if msg.body.startswith("Request"):
+                    await self.route_request(sender_jid, msg.body)
+                elif msg.body.startswith("Candidate"):
+                    await self.process_candidate(sender_jid, msg.body)
+                elif msg.body.startswith("Summary"):
+                    try:
+                        vacant_spaces, vacant_zones = map(int, msg.body.split()[1:3])
+                        self.owner.update_region_summary(sender_jid, vacant_spaces, vacant_zones)
+                    except ValueError as e:
+                        print(f"Error processing summary: {e}")
+
+            # Answer the drivers whose regions did not all reply in time
+            now = time.monotonic()
+            for request_id, (driver_jid, deadline, waiting, best) in list(self.pending.items()):
+                if now >= deadline:
+                    await self.answer(request_id)
+
+        async def route_request(self, driver_jid, request):
+            """Forward a driver request to the regions around its location"""
+            # Example: "Request Outdoor-Preferred Low 40.7128 -74.0060"
+            params = request.split()[1:]
+            try:
+                lat = float(params[2])
+                lon = float(params[3])
+            except (ValueError, IndexError):
+                lat = lon = None
+
+            regions = self.owner.find_regions(lat, lon)
+            if not regions:
+                response_msg = Message(to=driver_jid)
+                response_msg.body = "NoSpotAvailable"
+                await self.send(response_msg)
+                return
+
+            request_id = str(next(self.request_ids))
+            self.pending[request_id] = (driver_jid, time.monotonic() + ROUTER_RESPONSE_TIMEOUT, set(regions), None)
+            for manager_jid in regions:
+                query_msg = Message(to=manager_jid)
+                query_msg.body = f"Query {request_id} {' '.join(params)}"
+                await self.send(query_msg)
+
+        async def process_candidate(self, manager_jid, candidate):
+            """Keep the best zone proposed by the regions for a request"""
+            # Example: "Candidate 12 pz1@isep.lan 11" or "Candidate 12 None"
+            parts = candidate.split()
+            request_id = parts[1]
+            if request_id not in self.pending:
+                return
+
+            driver_jid, deadline, waiting, best = self.pending[request_id]
+            waiting.discard(manager_jid)
+            if len(parts) >= 4 and parts[2] != "None":
+                score = float(parts[3])
+                if best is None or score > best[1]:
+                    best = (parts[2], score)
+            self.pending[request_id] = (driver_jid, deadline, waiting, best)
+
+            if not waiting:
+                await self.answer(request_id)
+
+        async def answer(self, request_id):
+            """Send the best zone found for a request to the driver"""
+            driver_jid, deadline, waiting, best = self.pending.pop(request_id)
+            response_msg = Message(to=driver_jid)
+            response_msg.body = best[0] if best else "NoSpotAvailable"
+            await self.send(response_msg)
+
+    def __init__(self, jid: str, password: str, verify_security: bool = False):
+        super().__init__(jid, password, verify_security)
+        self.regions = {}  # Dictionary of regional manager JID -> region center (lat, lon)
+        self.region_summaries = {}  # Dictionary of regional manager JID -> (vacant spaces, zones with vacancy)
+
+    async def setup(self):
+        """Agent setup - add the routing behaviour"""
+        route_behaviour = self.RouteBehaviour(self)
+        self.add_behaviour(route_behaviour)
+
+    def add_region(self, manager_jid, lat, lon):
+        """Register a regional parking manager and the center of the region it owns"""
+        self.regions[manager_jid] = (lat, lon)
+
+    def update_region_summary(self, manager_jid, vacant_spaces, vacant_zones):
+        """Update the vacancy summary reported by a regional manager"""
+        self.region_summaries[manager_jid] = (vacant_spaces, vacant_zones)
+
+    def has_vacancy(self, manager_jid):
+        """Whether a region may have vacant spaces (regions that have not reported yet are assumed to)"""
+        summary = self.region_summaries.get(manager_jid)
+        return summary is None or summary[0] > 0
+
+    def find_regions(self, lat=None, lon=None):
+        """
+        Find the regions a request should go to: the region owning the location, plus the neighbouring
+        regions when the location is near a border. Regions reporting no vacancy are skipped, falling back
+        to the nearest region that has vacant spaces.
+        """
+        if not self.regions:
+            return []
+        if lat is None or lon is None:
+            return [jid for jid in self.regions if self.has_vacancy(jid)]
+
+        distances = sorted(
+            (calculate_distance(lat, lon, region_lat, region_lon), jid)
+            for jid, (region_lat, region_lon) in self.regions.items()
+        )
+        nearest_distance = distances[0][0]
+        regions = [jid for distance, jid in distances
+                   if distance - nearest_distance <= REGION_BORDER_MARGIN and self.has_vacancy(jid)]
+        if not regions:
+            regions = [jid for distance, jid in distances if self.has_vacancy(jid)][:1]
+        return regions
@@ -1,11 +1,6 @@
 import random
 import time
 from datetime import datetime
-import sys
-import os
-
-# Add the parent directory to the path to import constants
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour, OneShotBehaviour
@@ -18,10 +13,11 @@ class ParkingSpotModule(Agent):
     Agent representing a physical parking spot with ultrasonic sensor
     """
 
-    def __init__(self, agent_jid, agent_password, manager_jid, lat, lon):
+    def __init__(self, agent_jid, agent_password, manager_jid, lat, lon, seed=None):
         super().__init__(jid=agent_jid, password=agent_password)
         self.manager_jid = manager_jid
-        self.cash = random.randrange(100, 200)
+        self.random = random.Random(seed)  # Seed it to make bids reproducible
+        self.cash = self.random.randrange(100, 200)
         self.private_value = None
         self.time_arrived = None
         self.is_vacant = True
@@ -79,7 +75,7 @@ class ParkingSpotModule(Agent):
             msg = await self.receive(timeout=5)
             if msg:
                 if "AuctionStart" in msg.body:
-                    self.owner.private_value = random.randrange(30, 45)
+                    self.owner.private_value = self.owner.random.randrange(30, 45)
                     if self.owner.private_value > self.owner.cash:
                         self.owner.private_value = self.owner.cash
 
@@ -92,7 +88,7 @@ class ParkingSpotModule(Agent):
                         await self.send(bid_msg)
                 elif "BidRequest" in msg.body:
                     # Increase bid
-                    random_step = random.randrange(1, 5)
+                    random_step = self.owner.random.randrange(1, 5)
                     current_bid = int(msg.body.split()[-1])
                     new_bid = current_bid + random_step
                     # Fixed the logical operator from & to and
@@ -119,4 +115,5 @@ class ParkingSpotModule(Agent):
 
     async def execute_behaviour(self, sonar_value: int):
         inform_behaviour = self.InformBehaviour(self, sonar_value)
-        self.add_behaviour(inform_behaviour)
\ No newline at end of file
+        self.add_behaviour(inform_behaviour)
+        return inform_behaviour
\ No newline at end of file
@@ -2,17 +2,13 @@ import random
 import asyncio
 import time
 from datetime import datetime, timedelta
-import sys
-import os
 
-# Add the parent directory to the path to import constants
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-import paho.mqtt.client as mqtt
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
 from spade.message import Message
 from parking_system.constants import MQTT_PARKED_TOPIC, MQTT_DISPLAY_VALUE_TOPIC
+from parking_system.mqtt_client import get_mqtt_client
+from parking_system.reservations import ReservationBook
 
 
 class ParkingZoneManager(Agent):
@@ -33,14 +29,6 @@ class ParkingZoneManager(Agent):
             self.timestamp = datetime.now()
             self.number_of_poors = 0
             self.vacant_spaces = 0
-            
-            # MQTT client setup
-            self.client = mqtt.Client()
-            # Use environment variables or defaults
-            mqtt_host = os.environ.get('MQTT_BROKER_HOST', 'localhost')
-            mqtt_port = int(os.environ.get('MQTT_BROKER_PORT', '1883'))
-            self.client.connect(mqtt_host, mqtt_port)
-            
             self.driver = ""
             self.current_winner_lat = ""
             self.current_winner_lon = ""
@@ -57,7 +45,12 @@ class ParkingZoneManager(Agent):
             self.current_high_bid = 0
             self.current_winner = ""
             await self.notify_bidders(winner_bid, winner_jid)
-            
+
+            # Hold the spot for the driver so it is not auctioned again before the car arrives
+            if winner_jid:
+                self.owner.hold_parking_spot(winner_jid, self.driver)
+                await self.publish_vacancy()
+
             response_msg = Message(to=self.driver)
             response_msg.body = f"{winner_jid} {self.owner.price_hour} {self.owner.environment} {self.current_winner_lat} {self.current_winner_lon}"
             await self.send(response_msg)
@@ -66,7 +59,7 @@ class ParkingZoneManager(Agent):
             """Start a new auction for vacant parking spots"""
             self.owner.auction_in_progress = True
             self.timestamp = datetime.now()
-            initial_bid = random.randrange(10, 25)  # Set the initial bid value
+            initial_bid = self.owner.random.randrange(10, 25)  # Set the initial bid value
             for jid in vacant_spots:
                 start_msg = Message(to=jid)
                 start_msg.body = f"AuctionStart {initial_bid}"
@@ -81,6 +74,10 @@ class ParkingZoneManager(Agent):
 
         async def run(self):
             """Main behaviour loop"""
+            # Return spots whose reservation lapsed without the car arriving
+            if self.owner.expire_reservations():
+                await self.publish_vacancy()
+
             # Wait for incoming messages from ParkingSpotModule agents
             msg = await self.receive(timeout=5)
 
@@ -141,30 +138,36 @@ class ParkingZoneManager(Agent):
                     self.owner.update_parking_spot_status(sender_jid, vacancy_status)
                     if vacancy_status == "Occupied":
                         self.send_price(1)
-                    self.vacant_spaces = self.owner.count_vacant_parking_spots()
+                    await self.publish_vacancy()
 
-                    # Send display information via MQTT
-                    self.send_display()
+        async def publish_vacancy(self):
+            """Recount vacant spots and share the count with the display and the parking manager"""
+            self.vacant_spaces = self.owner.count_vacant_parking_spots()
 
-                    # Send environment information to the parking manager
-                    info = Message(to=self.owner.manager_jid)
-                    info.body = f"{self.vacant_spaces} {self.owner.lat} {self.owner.lon} {self.owner.price_hour} {self.owner.environment}"
-                    await self.send(info)
+            # Send display information via MQTT
+            self.send_display()
+
+            # Send environment information to the parking manager
+            info = Message(to=self.owner.manager_jid)
+            info.body = f"{self.vacant_spaces} {self.owner.lat} {self.owner.lon} {self.owner.price_hour} {self.owner.environment}"
+            await self.send(info)
 
         def send_display(self):
             """Send vacant spaces count to MQTT topic for display"""
             topic = MQTT_DISPLAY_VALUE_TOPIC.format(self.owner.pz_id)
-            self.client.publish(topic, self.vacant_spaces)
+            get_mqtt_client().publish(topic, self.vacant_spaces)
 
         def send_price(self, is_parked, price=""):
             """Send parking status and price information via MQTT"""
-            self.client.publish(MQTT_PARKED_TOPIC, f"{is_parked} {price}")
+            get_mqtt_client().publish(MQTT_PARKED_TOPIC, f"{is_parked} {price}")
 
     def __init__(self, jid: str, password: str, manager_jid, lat: float, lon: float, price_hour: float, environment: str,
-                 pz_id: str, verify_security: bool = False):
+                 pz_id: str, verify_security: bool = False, seed=None):
         super().__init__(jid, password, verify_security)
+        self.random = random.Random(seed)  # Seed it to make auctions reproducible
         self.auction_in_progress = False
         self.parking_spots = {}  # Dictionary to store parking spot status
+        self.reservations = ReservationBook()  # Spots held for auction winners
         self.manager_jid = manager_jid
         self.lat = lat
         self.lon = lon
@@ -182,18 +185,30 @@ class ParkingZoneManager(Agent):
         self.parking_spots[parking_module] = vacancy_status
         print(f"Parking spot {parking_module} is {vacancy_status}")
 
+        # The sensor confirmed the car, so the hold turns into occupancy
+        if vacancy_status == "Occupied":
+            self.reservations.release(parking_module)
+
+    def hold_parking_spot(self, parking_module, driver_jid):
+        """Reserve a parking spot for a driver until it is occupied or the hold expires"""
+        self.reservations.hold(parking_module, driver_jid)
+        print(f"Parking spot {parking_module} is Reserved for {driver_jid}")
+
+    def expire_reservations(self):
+        """Release lapsed reservations and return the freed parking spots"""
+        expired = self.reservations.expire()
+        for spot in expired:
+            print(f"Reservation for parking spot {spot} expired")
+        return expired
+
     def count_vacant_parking_spots(self):
-        """Count the number of vacant parking spots"""
-        vacant_count = 0
-        for status in self.parking_spots.values():
-            if status == "Vacant":
-                vacant_count += 1
-        return vacant_count
+        """Count the number of vacant parking spots that are not reserved"""
+        return len(self.find_vacant_parking_spots())
 
     def find_vacant_parking_spots(self):
-        """Find all vacant parking spots"""
+        """Find all vacant parking spots that are not reserved"""
         vacant_spots = []
         for spot, vacancy in self.parking_spots.items():
-            if vacancy == "Vacant":
+            if vacancy == "Vacant" and spot not in self.reservations:
                 vacant_spots.append(spot)
         return vacant_spots
\ No newline at end of file
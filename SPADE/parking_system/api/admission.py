@@ -0,0 +1,148 @@
+"""
+Admission control for the requests handed to the agents
+"""
+
+import asyncio
+import time
+
+from parking_system.constants import AGENT_QUEUE_SIZE, MAX_PENDING_WORK, BEHAVIOUR_TIMEOUT
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average with bursts of up to `capacity` requests
+    """
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def try_acquire(self):
+        """Take a token if one is available"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self):
+        """Seconds until the next token is available"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Keeps a token bucket per key (device or driver id).
+
+    `scale` multiplies the rate and the burst size, e.g. to replay a trace faster than it was
+    recorded; a scale of 0 turns the limit off.
+    """
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic, scale: float = 1.0):
+        self.enabled = scale > 0
+        self.rate = rate * scale
+        self.capacity = max(1, round(capacity * scale))
+        self.clock = clock
+        self.buckets = {}
+
+    def try_acquire(self, key):
+        """Take a token from the bucket of a key"""
+        if not self.enabled:
+            return True
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity, self.clock)
+            self.buckets[key] = bucket
+        return bucket.try_acquire()
+
+    def retry_after(self, key):
+        """Seconds until the key may send again"""
+        bucket = self.buckets.get(key)
+        return bucket.retry_after() if bucket else 0.0
+
+
+class WorkQueues:
+    """
+    Bounded work queue per agent, each drained one job at a time by its own worker task.
+
+    A job is a coroutine function; if it returns an agent behaviour, the worker waits for the
+    behaviour to finish before starting the next job, so an agent never runs more than one of
+    them at once. When an agent queue is full the oldest job is dropped if `drop_oldest` is set,
+    otherwise the new job is refused. New jobs are also refused once `max_pending` jobs are queued
+    across all agents.
+    """
+
+    def __init__(self, maxsize=AGENT_QUEUE_SIZE, drop_oldest=False, max_pending=MAX_PENDING_WORK,
+                 behaviour_timeout=BEHAVIOUR_TIMEOUT):
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.max_pending = max_pending
+        self.behaviour_timeout = behaviour_timeout
+        self.queues = {}  # agent id -> queue of jobs
+        self.workers = {}  # agent id -> task draining the queue
+        self.pending = 0
+        self.dropped = 0
+
+    def submit(self, key, job):
+        """Queue a job for an agent and return whether it was accepted"""
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.maxsize)
+            self.queues[key] = queue
+            self.workers[key] = asyncio.ensure_future(self.drain(queue))
+
+        if queue.full():
+            if not self.drop_oldest:
+                return False
+            queue.get_nowait()
+            self.pending -= 1
+            self.dropped += 1
+        elif self.pending >= self.max_pending:
+            return False
+
+        queue.put_nowait(job)
+        self.pending += 1
+        return True
+
+    async def drain(self, queue):
+        """Run the jobs of an agent one at a time"""
+        while True:
+            job = await queue.get()
+            self.pending -= 1
+            try:
+                behaviour = await job()
+                if behaviour is not None:
+                    await self.wait_for(behaviour)
+            except asyncio.CancelledError:
+                raise
+            except (TimeoutError, asyncio.TimeoutError):
+                print(f"Queued work did not finish within {self.behaviour_timeout}s")
+            except Exception as e:
+                print(f"Error running queued work: {e}")
+
+    async def wait_for(self, behaviour):
+        """
+        Wait for a behaviour to finish without blocking this loop. spade runs the agents on the
+        container's own loop thread, where Behaviour.join() would busy-wait synchronously, so the
+        join is scheduled on the agent's loop instead.
+        """
+        join = behaviour._async_join(self.behaviour_timeout)
+        agent_loop = behaviour.agent.loop
+        if agent_loop is asyncio.get_running_loop():
+            await join
+        else:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(join, agent_loop))
+
+    async def close(self):
+        """Stop all workers"""
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        self.queues.clear()
+        self.pending = 0
@@ -0,0 +1,113 @@
+"""
+MQTT ingestion of sensor readings published by the parking modules
+"""
+
+import asyncio
+import math
+import os
+
+from parking_system.constants import (MQTT_SENSOR_SUBSCRIPTION, SENSOR_QUEUE_SIZE, SENSOR_BATCH_SIZE)
+
+
+class SensorSubscriber:
+    """
+    Subscribes to sensors/{zone}/{spot} and hands sonar readings to the agents.
+
+    The paho network loop runs in its own thread and only hands readings over to the event loop.
+    Readings are kept in a bounded queue per zone; when a queue is full the oldest reading is
+    dropped. Each zone is drained in batches where only the latest reading of every spot is kept.
+    """
+
+    def __init__(self, dispatch, host=None, port=None, subscription=MQTT_SENSOR_SUBSCRIPTION,
+                 queue_size=SENSOR_QUEUE_SIZE, batch_size=SENSOR_BATCH_SIZE, client=None):
+        self.dispatch = dispatch  # coroutine function called with (zone_id, pmodule_id, sonar_value)
+        self.host = host or os.environ.get('MQTT_BROKER_HOST', 'localhost')
+        self.port = port or int(os.environ.get('MQTT_BROKER_PORT', '1883'))
+        self.subscription = subscription
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.client = client
+        self.loop = None
+        self.queues = {}  # zone id -> queue of (pmodule id, sonar value)
+        self.workers = {}  # zone id -> task draining the zone queue
+        self.dropped = 0
+
+    async def start(self):
+        """Connect to the broker in the background and start receiving readings"""
+        self.loop = asyncio.get_running_loop()
+        if self.client is None:
+            import paho.mqtt.client as mqtt
+
+            self.client = mqtt.Client()
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        self.client.connect_async(self.host, self.port)
+        self.client.loop_start()
+
+    async def stop(self):
+        """Disconnect from the broker and stop draining the zone queues"""
+        if self.client is not None:
+            self.client.loop_stop()
+            self.client.disconnect()
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+
+    def on_connect(self, client, userdata, flags, rc):
+        """Subscribe again on every (re)connection"""
+        client.subscribe(self.subscription)
+
+    def on_message(self, client, userdata, msg):
+        """Called from the paho network thread for every published reading"""
+        # paho re-raises callback errors, which would stop its network thread, so nothing may escape
+        try:
+            reading = self.parse(msg.topic, msg.payload)
+            if reading:
+                self.loop.call_soon_threadsafe(self.enqueue, *reading)
+        except Exception as e:
+            print(f"Error handling message on {msg.topic}: {e}")
+
+    def parse(self, topic, payload):
+        """Extract (zone id, module id, sonar value) from a sensor message"""
+        parts = topic.split("/")
+        if len(parts) != 3:
+            return None
+        try:
+            sonar_value = float(payload)
+        except ValueError:
+            sonar_value = None
+        if sonar_value is None or not math.isfinite(sonar_value):
+            print(f"Invalid sonar value on {topic}: {payload!r}")
+            return None
+        sonar_value = int(sonar_value)
+        return parts[1], parts[2], sonar_value
+
+    def enqueue(self, zone_id, pmodule_id, sonar_value):
+        """Queue a reading for its zone, dropping the oldest one when the queue is full"""
+        queue = self.queues.get(zone_id)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            self.queues[zone_id] = queue
+            self.workers[zone_id] = asyncio.ensure_future(self.drain(zone_id, queue))
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait((pmodule_id, sonar_value))
+
+    async def drain(self, zone_id, queue):
+        """Hand the readings of a zone to the agents in batches"""
+        while True:
+            pmodule_id, sonar_value = await queue.get()
+            batch = {pmodule_id: sonar_value}
+            for _ in range(self.batch_size - 1):
+                if queue.empty():
+                    break
+                pmodule_id, sonar_value = queue.get_nowait()
+                batch[pmodule_id] = sonar_value
+
+            for pmodule_id, sonar_value in batch.items():
+                try:
+                    await self.dispatch(zone_id, pmodule_id, sonar_value)
+                except Exception as e:
+                    print(f"Error handling reading from {pmodule_id}: {e}")
@@ -0,0 +1,134 @@
+"""
+Binary traces of the requests received at the API boundary
+"""
+
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from parking_system.constants import TRACE_FLUSH_INTERVAL
+
+TRACE_MAGIC = b"PKTR"
+TRACE_VERSION = 1
+
+# Record kinds and the fields they carry: s = string, i = integer, d = float64
+CREATE_MANAGER = 1
+CREATE_ZONE = 2
+CREATE_SPOT = 3
+CREATE_DRIVER = 4
+SONAR = 5
+DRIVER_REQUEST = 6
+CREATE_ROUTER = 7
+CREATE_REGION = 8
+
+RECORD_FIELDS = {
+    CREATE_MANAGER: "s",         # manager_id
+    CREATE_ZONE: "ssddds",       # zone_id, manager_id, lat, lon, price_hour, environment
+    CREATE_SPOT: "ssdd",         # pmodule_id, zone_id, lat, lon
+    CREATE_DRIVER: "ss",         # driver_id, manager_id
+    SONAR: "si",                 # pmodule_id, sonar_value
+    DRIVER_REQUEST: "sddss",     # driver_id, lat, lon, environment, pricing
+    CREATE_ROUTER: "s",          # router_id
+    CREATE_REGION: "ssdd",       # manager_id, router_id, lat, lon
+}
+
+_VERSION = struct.Struct("<B")
+_HEADER = struct.Struct("<dB")  # seconds since the trace started, record kind
+_LENGTH = struct.Struct("<H")
+_INTEGER = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+
+TraceEvent = namedtuple("TraceEvent", ["time", "kind", "fields"])
+
+
+class TraceRecorder:
+    """
+    Appends records to a trace file.
+
+    Each record is a fixed header followed by its fields; strings are stored with a two byte length.
+    Records are buffered so recording does not make a syscall per request on the event loop. A
+    background thread flushes the buffer every `flush_interval` seconds, so a crash, the incident the
+    trace is meant to reproduce, loses at most that much of the trace.
+    """
+
+    def __init__(self, path, clock=time.monotonic, flush_interval=TRACE_FLUSH_INTERVAL):
+        self.clock = clock
+        self.started = clock()
+        self.file = open(path, "wb")
+        self.file.write(TRACE_MAGIC + _VERSION.pack(TRACE_VERSION))
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self.flush_periodically, args=(flush_interval,), daemon=True)
+        self.flusher.start()
+
+    def record(self, kind, *fields):
+        """Append a record of the given kind, skipping it if a field does not fit the format"""
+        try:
+            record = _HEADER.pack(self.clock() - self.started, kind) + encode_fields(RECORD_FIELDS[kind], fields)
+        except struct.error as e:
+            print(f"Skipping trace record {kind} {fields}: {e}")
+            return
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(record)
+
+    def flush_periodically(self, interval):
+        while not self.closed.wait(interval):
+            with self.lock:
+                self.file.flush()
+
+    def close(self):
+        self.closed.set()
+        self.flusher.join()
+        with self.lock:
+            self.file.close()
+
+
+def encode_fields(spec, fields):
+    """Encode record fields following their spec"""
+    data = bytearray()
+    for field_type, value in zip(spec, fields):
+        if field_type == "s":
+            encoded = str(value).encode("utf-8")
+            data += _LENGTH.pack(len(encoded)) + encoded
+        elif field_type == "i":
+            data += _INTEGER.pack(value)
+        else:
+            data += _FLOAT.pack(value)
+    return bytes(data)
+
+
+def read_trace(path):
+    """Yield the events stored in a trace file"""
+    with open(path, "rb") as trace_file:
+        data = trace_file.read()
+    if not data.startswith(TRACE_MAGIC) or len(data) < len(TRACE_MAGIC) + _VERSION.size:
+        raise ValueError(f"{path} is not a parking trace")
+    (version,) = _VERSION.unpack_from(data, len(TRACE_MAGIC))
+    if version != TRACE_VERSION:
+        raise ValueError(f"{path} uses unsupported trace format version {version}")
+
+    offset = len(TRACE_MAGIC) + _VERSION.size
+    while offset < len(data):
+        try:
+            timestamp, kind = _HEADER.unpack_from(data, offset)
+            offset += _HEADER.size
+            if kind not in RECORD_FIELDS:
+                raise ValueError(f"{path} has an unknown record kind {kind}")
+            fields = []
+            for field_type in RECORD_FIELDS[kind]:
+                if field_type == "s":
+                    (length,) = _LENGTH.unpack_from(data, offset)
+                    offset += _LENGTH.size
+                    fields.append(data[offset:offset + length].decode("utf-8"))
+                    offset += length
+                else:
+                    number = _INTEGER if field_type == "i" else _FLOAT
+                    (value,) = number.unpack_from(data, offset)
+                    offset += number.size
+                    fields.append(value)
+        except struct.error:
+            # The last record was cut short, e.g. the server stopped while writing it
+            return
+        yield TraceEvent(timestamp, kind, tuple(fields))
@@ -27,4 +27,52 @@ DEFAULT_AGENT_PASSWORD = "agent_password"
 DEFAULT_DOMAIN = "isep.lan"
 
 # Distance thresholds (in cm)
-PARKING_OCCUPIED_THRESHOLD = 30
\ No newline at end of file
+PARKING_OCCUPIED_THRESHOLD = 30
+
+# Time a spot is held for an auction winner before it is released (in seconds)
+RESERVATION_HOLD_TTL = 120
+
+# Sensor readings published by the parking modules, as sensors/{zone}/{spot}
+MQTT_SENSOR_TOPIC = "sensors/{}/{}"
+MQTT_SENSOR_SUBSCRIPTION = "sensors/+/+"
+
+# Pending sensor readings kept per zone and readings handled per batch
+SENSOR_QUEUE_SIZE = 1024
+SENSOR_BATCH_SIZE = 64
+
+# Token bucket limits per device and per driver (requests per second, burst size)
+SENSOR_RATE_LIMIT = (1.0, 5)
+DRIVER_RATE_LIMIT = (0.5, 3)
+
+# Pending work kept per agent and across all agents before new work is refused
+AGENT_QUEUE_SIZE = 4
+MAX_PENDING_WORK = 10000
+
+# Time to wait for an agent behaviour to finish before moving to the next one (in seconds)
+BEHAVIOUR_TIMEOUT = 30
+
+# A request whose distance to a neighbouring region center is within this margin of the distance
+# to its own region center is also sent to the neighbouring region (in km)
+REGION_BORDER_MARGIN = 1.0
+
+# Interval between vacancy summaries sent by regional managers (in seconds)
+REGION_SUMMARY_PERIOD = 10
+
+# Time the router waits for regional managers to answer a request (in seconds)
+ROUTER_RESPONSE_TIMEOUT = 5
+
+# Agents connecting to the XMPP server at the same time
+AGENT_START_CONCURRENCY = 100
+
+# Behaviour iterations holding the event loop longer than this are reported as slow (in seconds)
+SLOW_ITERATION_THRESHOLD = 0.1
+
+# Event loop lag sampling interval and the lag reported as a warning (in seconds)
+LOOP_LAG_INTERVAL = 0.5
+LOOP_LAG_WARNING = 0.1
+
+# Interval between stack samples taken by the sampling profiler (in seconds)
+PROFILER_SAMPLE_INTERVAL = 0.005
+
+# Longest time recorded trace records stay in memory before being written to the file (in seconds)
+TRACE_FLUSH_INTERVAL = 1.0
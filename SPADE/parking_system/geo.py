@@ -0,0 +1,24 @@
+"""
+Geographic helpers shared by the agents
+"""
+
+from math import radians, sin, cos, sqrt, atan2
+
+# Earth's radius in kilometers
+EARTH_RADIUS = 6371.0
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate the distance in kilometers between two locations using the Haversine formula"""
+    # Convert degrees to radians
+    lat1_rad = radians(lat1)
+    lon1_rad = radians(lon1)
+    lat2_rad = radians(lat2)
+    lon2_rad = radians(lon2)
+
+    # Haversine formula
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+    a = sin(dlat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return EARTH_RADIUS * c
@@ -0,0 +1,23 @@
+"""
+MQTT client shared by the agents that publish to the displays
+"""
+
+import os
+
+_client = None
+
+
+def get_mqtt_client():
+    """Return the process-wide MQTT client, connecting it in the background on first use"""
+    global _client
+    if _client is None:
+        import paho.mqtt.client as mqtt
+
+        client = mqtt.Client()
+        # Use environment variables or defaults
+        mqtt_host = os.environ.get('MQTT_BROKER_HOST', 'localhost')
+        mqtt_port = int(os.environ.get('MQTT_BROKER_PORT', '1883'))
+        client.connect_async(mqtt_host, mqtt_port)
+        client.loop_start()
+        _client = client
+    return _client
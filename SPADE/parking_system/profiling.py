@@ -0,0 +1,231 @@
+"""
+Opt-in profiling of agent behaviours and of the event loop
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+
+from parking_system.constants import (SLOW_ITERATION_THRESHOLD, LOOP_LAG_INTERVAL, LOOP_LAG_WARNING,
+                                      PROFILER_SAMPLE_INTERVAL)
+
+
+class BehaviourStats:
+    """
+    Counters for one behaviour class.
+
+    `wall` is the total duration of the run() calls, including the time spent waiting for messages.
+    `loop` is the time run() actually held the event loop and `cpu` the CPU time used meanwhile.
+    """
+
+    def __init__(self):
+        self.invocations = 0
+        self.wall = 0.0
+        self.loop = 0.0
+        self.cpu = 0.0
+        self.max_loop = 0.0
+        self.idle_receives = 0
+        self.slow_iterations = 0
+
+    def as_dict(self):
+        return {
+            "invocations": self.invocations,
+            "wall_seconds": round(self.wall, 6),
+            "loop_seconds": round(self.loop, 6),
+            "cpu_seconds": round(self.cpu, 6),
+            "max_loop_seconds": round(self.max_loop, 6),
+            "idle_receives": self.idle_receives,
+            "slow_iterations": self.slow_iterations,
+        }
+
+
+class _TimedRun:
+    """
+    Drives a run() coroutine step by step, timing each step.
+
+    Only the steps are timed, so the time other tasks run while the behaviour awaits is not counted.
+    """
+
+    def __init__(self, coroutine, stats, name):
+        self.coroutine = coroutine
+        self.stats = stats
+        self.name = name
+
+    def __await__(self):
+        started = time.perf_counter()
+        loop_time = 0.0
+        cpu_time = 0.0
+        value, error = None, None
+        try:
+            while True:
+                step_started = time.perf_counter()
+                step_cpu = time.thread_time()
+                try:
+                    if error is not None:
+                        yielded = self.coroutine.throw(error)
+                    else:
+                        yielded = self.coroutine.send(value)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    loop_time += time.perf_counter() - step_started
+                    cpu_time += time.thread_time() - step_cpu
+
+                try:
+                    value, error = (yield yielded), None
+                except GeneratorExit:
+                    self.coroutine.close()
+                    raise
+                except BaseException as e:
+                    value, error = None, e
+        finally:
+            stats = self.stats
+            stats.invocations += 1
+            stats.wall += time.perf_counter() - started
+            stats.loop += loop_time
+            stats.cpu += cpu_time
+            stats.max_loop = max(stats.max_loop, loop_time)
+            if loop_time > SLOW_ITERATION_THRESHOLD:
+                stats.slow_iterations += 1
+                print(f"Slow iteration: {self.name} held the event loop for {loop_time * 1000:.1f} ms")
+
+
+class Profiler:
+    """
+    Collects behaviour statistics and event loop lag.
+
+    spade runs every agent on its container's loop, in a thread separate from the API's loop, so the
+    lag monitor and the stack sampler watch that agent loop by default.
+    """
+
+    def __init__(self):
+        self.behaviours = {}  # behaviour name -> BehaviourStats
+        self.lag_samples = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+        self.lag_task = None
+        self.agent_loop = None
+
+    def stats_for(self, name):
+        stats = self.behaviours.get(name)
+        if stats is None:
+            stats = BehaviourStats()
+            self.behaviours[name] = stats
+        return stats
+
+    def instrument(self, behaviour):
+        """Wrap the run() and receive() methods of a behaviour instance"""
+        name = type(behaviour).__qualname__
+        stats = self.stats_for(name)
+        run = behaviour.run
+        receive = behaviour.receive
+
+        def timed_run():
+            return _TimedRun(run(), stats, name)
+
+        async def counted_receive(*args, **kwargs):
+            msg = await receive(*args, **kwargs)
+            if msg is None:
+                stats.idle_receives += 1
+            return msg
+
+        behaviour.run = timed_run
+        behaviour.receive = counted_receive
+        return behaviour
+
+    def install(self):
+        """Instrument every behaviour added to an agent from now on"""
+        from spade.agent import Agent
+        from spade.container import Container
+
+        self.agent_loop = Container().loop
+
+        add_behaviour = Agent.add_behaviour
+        profiler = self
+
+        def profiled_add_behaviour(agent, behaviour, template=None):
+            return add_behaviour(agent, profiler.instrument(behaviour), template)
+
+        Agent.add_behaviour = profiled_add_behaviour
+
+    def start_lag_monitor(self, interval=LOOP_LAG_INTERVAL, loop=None):
+        """
+        Measure how late an event loop (the agent loop by default) wakes up a task sleeping for
+        `interval` seconds
+        """
+        async def monitor():
+            while True:
+                started = time.perf_counter()
+                await asyncio.sleep(interval)
+                lag = max(0.0, time.perf_counter() - started - interval)
+                self.lag_samples += 1
+                self.lag_last = lag
+                self.lag_total += lag
+                self.lag_max = max(self.lag_max, lag)
+                if lag > LOOP_LAG_WARNING:
+                    print(f"Event loop lag: {lag * 1000:.1f} ms")
+
+        loop = loop or self.agent_loop or asyncio.get_running_loop()
+        # A concurrent future, so the monitor can run on the agent loop and be cancelled from the API loop
+        self.lag_task = asyncio.run_coroutine_threadsafe(monitor(), loop)
+
+    async def stop(self):
+        if self.lag_task is not None:
+            self.lag_task.cancel()
+            await asyncio.gather(asyncio.wrap_future(self.lag_task), return_exceptions=True)
+            self.lag_task = None
+
+    async def agent_thread_id(self):
+        """Identifier of the thread running the agent loop"""
+        loop = self.agent_loop
+        if loop is None or loop is asyncio.get_running_loop():
+            return threading.get_ident()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_thread_id(), loop))
+
+    def report(self):
+        return {
+            "behaviours": {name: stats.as_dict() for name, stats in sorted(self.behaviours.items())},
+            "loop_lag": {
+                "samples": self.lag_samples,
+                "last_seconds": round(self.lag_last, 6),
+                "mean_seconds": round(self.lag_total / self.lag_samples, 6) if self.lag_samples else 0.0,
+                "max_seconds": round(self.lag_max, 6),
+            },
+        }
+
+
+async def _thread_id():
+    return threading.get_ident()
+
+
+async def sample_stacks(seconds, interval=PROFILER_SAMPLE_INTERVAL, thread_id=None):
+    """
+    Sample the stack of a thread (the calling event loop's thread by default) for `seconds` and return
+    the samples in folded format ("frame;frame;frame count" per line), as used by flame graph tools.
+    """
+    thread_id = thread_id or threading.get_ident()
+    samples = Counter()
+    done = threading.Event()
+
+    def sampler():
+        while not done.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                samples[";".join(reversed(stack))] += 1
+
+    thread = threading.Thread(target=sampler, daemon=True)
+    thread.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        done.set()
+        thread.join()
+    return "\n".join(f"{stack} {count}" for stack, count in samples.most_common())
@@ -0,0 +1,122 @@
+"""
+Replays a recorded trace against a running parking management server
+
+Usage:
+    python -m parking_system.replay trace.bin --speed 1     # real time
+    python -m parking_system.replay trace.bin --speed 10    # ten times faster
+    python -m parking_system.replay trace.bin --speed max   # as fast as possible
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from parking_system.api import trace
+
+# Configuration
+BASE_URL = "http://localhost:8000"
+
+
+def build_request(event):
+    """Turn a trace event into the HTTP request that produced it"""
+    fields = event.fields
+    if event.kind == trace.CREATE_MANAGER:
+        return "post", f"/parking_manager/{fields[0]}", {}
+    if event.kind == trace.CREATE_ZONE:
+        zone_id, manager_id, lat, lon, price_hour, environment = fields
+        params = {"lat": lat, "lon": lon, "price_hour": price_hour, "environment": environment}
+        return "post", f"/parking_zone/{zone_id}/{manager_id}", {"params": params}
+    if event.kind == trace.CREATE_SPOT:
+        pmodule_id, zone_id, lat, lon = fields
+        return "post", f"/parking_module/{pmodule_id}/{zone_id}", {"json": {"lat": lat, "lon": lon}}
+    if event.kind == trace.CREATE_DRIVER:
+        driver_id, manager_id = fields
+        return "post", f"/driver/{driver_id}", {"params": {"manager_id": manager_id}}
+    if event.kind == trace.CREATE_ROUTER:
+        return "post", f"/parking_router/{fields[0]}", {}
+    if event.kind == trace.CREATE_REGION:
+        manager_id, router_id, lat, lon = fields
+        return "post", f"/parking_region/{manager_id}/{router_id}", {"params": {"lat": lat, "lon": lon}}
+    if event.kind == trace.SONAR:
+        pmodule_id, sonar_value = fields
+        return "post", f"/parking_module/{pmodule_id}", {"json": {"sonar_value": sonar_value}}
+    if event.kind == trace.DRIVER_REQUEST:
+        driver_id, lat, lon, environment, pricing = fields
+        params = {"lat": lat, "lon": lon, "environment": environment, "pricing": pricing}
+        return "get", f"/driver/{driver_id}", {"params": params}
+    raise ValueError(f"Unknown trace record kind {event.kind}")
+
+
+async def replay(path, speed=1.0, base_url=BASE_URL, workers=64):
+    """
+    Send the requests of a trace to the server, keeping their relative timing divided by `speed`
+    (no waiting at all when `speed` is None). Requests are sent in trace order; driver requests
+    block until a spot is assigned, so they run concurrently with the rest of the trace.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    session = requests.Session()
+    statuses = Counter()
+    latencies = []
+    driver_requests = []
+
+    def send(event):
+        method, path, kwargs = build_request(event)
+        started = time.monotonic()
+        response = session.request(method, base_url + path, **kwargs)
+        statuses[response.status_code] += 1
+        if event.kind == trace.DRIVER_REQUEST:
+            latencies.append(time.monotonic() - started)
+
+    started = time.monotonic()
+    count = 0
+    for event in trace.read_trace(path):
+        if speed is not None:
+            delay = started + event.time / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        request = loop.run_in_executor(executor, send, event)
+        if event.kind == trace.DRIVER_REQUEST:
+            driver_requests.append(request)
+        else:
+            await request
+        count += 1
+
+    await asyncio.gather(*driver_requests)
+    executor.shutdown()
+    return count, time.monotonic() - started, statuses, sorted(latencies)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded parking trace")
+    parser.add_argument("trace", help="trace file recorded with PARKING_TRACE_FILE")
+    parser.add_argument("--speed", default="1", help="replay speed factor, or 'max' to send without waiting")
+    parser.add_argument("--url", default=BASE_URL, help="server base URL")
+    args = parser.parse_args()
+
+    try:
+        speed = None if args.speed == "max" else float(args.speed)
+    except ValueError:
+        parser.error("--speed must be a number or 'max'")
+    if speed is not None and not speed > 0:
+        parser.error("--speed must be greater than 0")
+    count, elapsed, statuses, latencies = asyncio.run(replay(args.trace, speed, args.url))
+
+    print(f"Replayed {count} requests in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.1f} req/s)")
+    print(f"Status codes: {dict(statuses)}")
+    print(f"Driver requests: {len(latencies)}, p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, max {percentile(latencies, 1.0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Reservation holds for parking spots assigned to drivers
+"""
+
+import heapq
+import time
+
+from parking_system.constants import RESERVATION_HOLD_TTL
+
+
+class ReservationBook:
+    """
+    Keeps track of parking spots held for a driver until the sensor confirms the car arrived.
+
+    Expiry times are kept in a min-heap so lapsed holds can be collected without scanning
+    every reservation. Entries made stale by a release or a renewed hold are skipped lazily.
+    """
+
+    def __init__(self, ttl: float = RESERVATION_HOLD_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.holds = {}  # spot jid -> (expiry, driver jid)
+        self._expiries = []  # heap of (expiry, spot jid)
+
+    def __contains__(self, spot):
+        return spot in self.holds
+
+    def __len__(self):
+        return len(self.holds)
+
+    def hold(self, spot, driver):
+        """Hold a spot for a driver until the TTL lapses"""
+        expiry = self.clock() + self.ttl
+        self.holds[spot] = (expiry, driver)
+        heapq.heappush(self._expiries, (expiry, spot))
+        return expiry
+
+    def release(self, spot):
+        """Release the hold on a spot and return the driver it was held for"""
+        entry = self.holds.pop(spot, None)
+        return entry[1] if entry else None
+
+    def expire(self):
+        """Release all holds whose TTL has lapsed and return the spots that were freed"""
+        now = self.clock()
+        expired = []
+        while self._expiries and self._expiries[0][0] <= now:
+            expiry, spot = heapq.heappop(self._expiries)
+            entry = self.holds.get(spot)
+            # Skip heap entries left behind by a release or a newer hold on the same spot
+            if entry and entry[0] == expiry:
+                del self.holds[spot]
+                expired.append(spot)
+        return expired
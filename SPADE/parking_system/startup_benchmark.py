@@ -0,0 +1,115 @@
+"""
+Measures how fast the server starts
+
+Reports the time to import main.py, and the time from launching the server until it accepts its first
+request and until the last pre-provisioned agent accepts a sensor reading, for 0, 100 and 10k agents.
+
+Usage:
+    python -m parking_system.startup_benchmark
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from parking_system.api import trace
+
+SPADE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENT_COUNTS = [0, 100, 10000]
+SPOTS_PER_ZONE = 100
+
+
+def measure_import_time():
+    """Time a cold import of main.py in a fresh interpreter"""
+    code = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=SPADE_DIR, capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def write_provision_trace(path, agent_count):
+    """Write a trace creating one manager, one zone per SPOTS_PER_ZONE spots and spots up to agent_count agents"""
+    recorder = trace.TraceRecorder(path)
+    last_spot = None
+    if agent_count > 0:
+        recorder.record(trace.CREATE_MANAGER, "pm1")
+        zone_count = min(agent_count - 1, max(1, agent_count // SPOTS_PER_ZONE))
+        for zone in range(zone_count):
+            recorder.record(trace.CREATE_ZONE, f"pz{zone}", "pm1", 41.17, -8.60, 2.5, "Outdoor")
+        for spot in range(agent_count - 1 - zone_count):
+            last_spot = f"ps{spot}"
+            recorder.record(trace.CREATE_SPOT, last_spot, f"pz{spot % zone_count}", 41.17, -8.60)
+    recorder.close()
+    return last_spot
+
+
+def request(url, data=None):
+    """Send a request and return its status code, or None if the server is not accepting connections yet"""
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as response:
+            payload = json.loads(response.read())
+            return response.status, payload
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (urllib.error.URLError, ConnectionError):
+        return None, None
+
+
+def measure_startup(agent_count, port, timeout):
+    """Launch the server with agent_count pre-provisioned agents and time its first accepted requests"""
+    with tempfile.TemporaryDirectory() as tmp:
+        provision_file = os.path.join(tmp, "provision.bin")
+        last_spot = write_provision_trace(provision_file, agent_count)
+        env = dict(os.environ, PARKING_PROVISION_FILE=provision_file, PORT=str(port))
+        base_url = f"http://127.0.0.1:{port}"
+
+        started = time.perf_counter()
+        server = subprocess.Popen([sys.executable, "main.py"], cwd=SPADE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            first_request = None
+            all_agents = None if last_spot else 0.0
+            while time.perf_counter() - started < timeout:
+                if first_request is None:
+                    status, _ = request(f"{base_url}/parking_preferences")
+                    if status == 200:
+                        first_request = time.perf_counter() - started
+                if first_request is not None and all_agents is None:
+                    status, payload = request(f"{base_url}/parking_module/{last_spot}", {"sonar_value": 100})
+                    if status == 200 and "Error" not in payload:
+                        all_agents = time.perf_counter() - started
+                if first_request is not None and all_agents is not None:
+                    break
+                time.sleep(0.01)
+            return first_request, all_agents
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def format_seconds(value):
+    return f"{value * 1000:.0f} ms" if value is not None else "timed out"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure server startup time")
+    parser.add_argument("--port", type=int, default=8100, help="port used for the benchmark servers")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for each server")
+    args = parser.parse_args()
+
+    print(f"Import main.py: {format_seconds(measure_import_time())}")
+    for agent_count in AGENT_COUNTS:
+        first_request, all_agents = measure_startup(agent_count, args.port, args.timeout)
+        print(f"{agent_count} agents: first accepted request {format_seconds(first_request)}, "
+              f"all agents registered {format_seconds(all_agents)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+# Make the parking_system package importable, as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class AgentLoop:
+    """Event loop running in its own thread, like spade's container loop"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        # Let cancelled tasks unwind before stopping the loop
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.01), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+@pytest.fixture
+def agent_loop():
+    loop = AgentLoop()
+    yield loop
+    loop.close()
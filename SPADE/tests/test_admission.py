@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+from parking_system.api.admission import RateLimiter, TokenBucket, WorkQueues
+
+
+class FakeBehaviour:
+    """Behaviour finishing after `duration` seconds, mirroring spade's _async_join"""
+
+    def __init__(self, agent, duration):
+        self.agent = agent
+        self.done_at = time.monotonic() + duration
+
+    async def _async_join(self, timeout):
+        started = time.monotonic()
+        while time.monotonic() < self.done_at:
+            await asyncio.sleep(0.001)
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError
+
+
+def test_token_bucket_refills_over_time():
+    now = [0.0]
+    bucket = TokenBucket(1.0, 2, clock=lambda: now[0])
+    assert [bucket.try_acquire() for _ in range(3)] == [True, True, False]
+    assert bucket.retry_after() == 1.0
+    now[0] = 1.0
+    assert bucket.try_acquire()
+
+
+def test_full_queue_drops_oldest_or_refuses():
+    async def scenario():
+        dropping, refusing = WorkQueues(maxsize=1, drop_oldest=True), WorkQueues(maxsize=1)
+
+        async def job():
+            return None
+
+        accepted = [dropping.submit("ps1", job) for _ in range(3)], [refusing.submit("d1", job) for _ in range(2)]
+        await dropping.close()
+        await refusing.close()
+        return accepted, dropping.dropped
+
+    (dropping, refusing), dropped = asyncio.run(scenario())
+    assert dropping == [True, True, True] and dropped == 2
+    assert refusing == [True, False]
+
+
+def test_waiting_for_behaviour_does_not_block_api_loop(agent_loop):
+    agent = type("Agent", (), {"loop": agent_loop.loop})()
+
+    async def scenario():
+        work = WorkQueues()
+        finished = []
+
+        async def job():
+            finished.append("started")
+            return FakeBehaviour(agent, 0.2)
+
+        work.submit("ps1", job)
+        ticks = 0
+        started = time.monotonic()
+        while time.monotonic() - started < 0.3:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        await work.close()
+        return ticks, finished
+
+    ticks, finished = asyncio.run(scenario())
+    assert finished == ["started"]
+    # The API loop kept running while the behaviour was in progress
+    assert ticks > 10
+
+
+def test_slow_behaviour_times_out(agent_loop):
+    agent = type("Agent", (), {"loop": agent_loop.loop})()
+
+    async def scenario():
+        work = WorkQueues(behaviour_timeout=0.05)
+        ran = []
+
+        async def job():
+            ran.append(len(ran))
+            return FakeBehaviour(agent, 10)
+
+        work.submit("ps1", job)
+        work.submit("ps1", job)
+        await asyncio.sleep(0.3)
+        await work.close()
+        return ran
+
+    ran = asyncio.run(scenario())
+    # The second job ran once the first behaviour timed out
+    assert ran == [0, 1]
+
+
+def test_rate_limit_scale():
+    now = [0.0]
+    scaled = RateLimiter(1.0, 2, clock=lambda: now[0], scale=10)
+    assert sum(scaled.try_acquire("ps1") for _ in range(30)) == 20
+    unlimited = RateLimiter(1.0, 2, clock=lambda: now[0], scale=0)
+    assert all(unlimited.try_acquire("ps1") for _ in range(100))
@@ -0,0 +1,94 @@
+import asyncio
+
+from parking_system.api.mqtt_ingestion import SensorSubscriber
+from parking_system.constants import MQTT_SENSOR_TOPIC
+
+
+class LocalBrokerClient:
+    """Stand-in for paho's Client that delivers publishes to its own subscriptions"""
+
+    class Message:
+        def __init__(self, topic, payload):
+            self.topic = topic
+            self.payload = payload
+
+    def __init__(self):
+        self.on_connect = None
+        self.on_message = None
+        self.subscriptions = []
+
+    def connect_async(self, host, port):
+        pass
+
+    def loop_start(self):
+        self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, subscription):
+        self.subscriptions.append(subscription)
+
+    def publish(self, topic, payload):
+        if any(self.matches(subscription, topic) for subscription in self.subscriptions):
+            self.on_message(self, None, self.Message(topic, payload))
+
+    @staticmethod
+    def matches(subscription, topic):
+        levels, patterns = topic.split("/"), subscription.split("/")
+        return len(levels) == len(patterns) and all(p in ("+", level) for p, level in zip(patterns, levels))
+
+
+def run_subscriber(publishes, **kwargs):
+    """Publish readings through a stand-in broker and return what was dispatched to the agents"""
+    dispatched = []
+
+    async def dispatch(zone_id, pmodule_id, sonar_value):
+        dispatched.append((zone_id, pmodule_id, sonar_value))
+
+    async def scenario():
+        client = LocalBrokerClient()
+        subscriber = SensorSubscriber(dispatch, client=client, **kwargs)
+        await subscriber.start()
+        for topic, payload in publishes:
+            client.publish(topic, payload)
+        await asyncio.sleep(0.05)
+        await subscriber.stop()
+        return subscriber
+
+    return dispatched, asyncio.run(scenario())
+
+
+def test_readings_are_dispatched_per_zone():
+    dispatched, _ = run_subscriber([
+        (MQTT_SENSOR_TOPIC.format("pz1", "ps1"), b"35"),
+        (MQTT_SENSOR_TOPIC.format("pz2", "ps2"), b"12.7"),
+    ])
+    assert sorted(dispatched) == [("pz1", "ps1", 35), ("pz2", "ps2", 12)]
+
+
+def test_batch_keeps_latest_reading_per_spot():
+    dispatched, _ = run_subscriber([(MQTT_SENSOR_TOPIC.format("pz1", "ps1"), str(value).encode())
+                                    for value in range(5)])
+    assert dispatched == [("pz1", "ps1", 4)]
+
+
+def test_full_queue_drops_oldest_reading():
+    dispatched, subscriber = run_subscriber([(MQTT_SENSOR_TOPIC.format("pz1", f"ps{spot}"), b"40")
+                                             for spot in range(5)], queue_size=2)
+    assert dispatched == [("pz1", "ps3", 40), ("pz1", "ps4", 40)]
+    assert subscriber.dropped == 3
+
+
+def test_invalid_payloads_are_ignored():
+    dispatched, _ = run_subscriber([
+        (MQTT_SENSOR_TOPIC.format("pz1", "ps1"), b"inf"),
+        (MQTT_SENSOR_TOPIC.format("pz1", "ps1"), b"nan"),
+        (MQTT_SENSOR_TOPIC.format("pz1", "ps1"), b"far"),
+        (MQTT_SENSOR_TOPIC.format("pz1", "ps1"), b"\xff"),
+        ("sensors/pz1", b"35"),
+    ])
+    assert dispatched == []
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+from parking_system import profiling
+
+
+class BlockingBehaviour:
+    async def receive(self, timeout=None):
+        await asyncio.sleep(timeout)
+        return None
+
+    async def run(self):
+        await self.receive(timeout=0.01)
+        time.sleep(0.15)
+
+
+def test_slow_iterations_and_idle_receives_are_counted():
+    profiler = profiling.Profiler()
+    behaviour = profiler.instrument(BlockingBehaviour())
+
+    async def step():
+        # spade awaits run() from its behaviour loop
+        await behaviour.run()
+
+    asyncio.run(step())
+
+    stats = profiler.report()["behaviours"]["BlockingBehaviour"]
+    assert stats["invocations"] == 1
+    assert stats["idle_receives"] == 1
+    assert stats["slow_iterations"] == 1
+    assert stats["loop_seconds"] >= 0.15
+
+
+def test_lag_and_stacks_come_from_the_agent_loop(agent_loop):
+    profiler = profiling.Profiler()
+    profiler.agent_loop = agent_loop.loop
+
+    def block():
+        time.sleep(0.2)
+
+    async def scenario():
+        profiler.start_lag_monitor(interval=0.02)
+        thread_id = await profiler.agent_thread_id()
+        sampling = asyncio.ensure_future(profiling.sample_stacks(0.3, interval=0.005, thread_id=thread_id))
+        await asyncio.sleep(0.05)
+        agent_loop.loop.call_soon_threadsafe(block)
+        stacks = await sampling
+        await profiler.stop()
+        return thread_id, stacks
+
+    thread_id, stacks = asyncio.run(scenario())
+    assert thread_id == agent_loop.thread.ident
+    assert "block" in stacks
+    assert profiler.report()["loop_lag"]["max_seconds"] >= 0.1
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from parking_system.reservations import ReservationBook
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hold_expires_after_ttl():
+    clock = Clock()
+    book = ReservationBook(ttl=10, clock=clock)
+    book.hold("ps1", "d1")
+
+    clock.now = 9.9
+    assert book.expire() == []
+    assert "ps1" in book
+
+    clock.now = 10
+    assert book.expire() == ["ps1"]
+    assert "ps1" not in book
+
+
+def test_release_before_expiry():
+    clock = Clock()
+    book = ReservationBook(ttl=10, clock=clock)
+    book.hold("ps1", "d1")
+
+    assert book.release("ps1") == "d1"
+    assert book.release("ps1") is None
+    clock.now = 10
+    assert book.expire() == []
+    assert len(book) == 0
+
+
+def test_stale_entry_does_not_expire_new_hold():
+    clock = Clock()
+    book = ReservationBook(ttl=10, clock=clock)
+    book.hold("ps1", "d1")
+    book.release("ps1")
+
+    clock.now = 5
+    book.hold("ps1", "d2")
+    clock.now = 10
+    # The first hold's heap entry is due but belongs to the released hold
+    assert book.expire() == []
+    assert "ps1" in book
+
+    clock.now = 15
+    assert book.expire() == ["ps1"]
+
+
+def test_vacant_spots_exclude_held_spots():
+    ParkingZoneManager = pytest.importorskip("parking_system.agents.ParkingZoneManager").ParkingZoneManager
+    zone = SimpleNamespace(
+        parking_spots={"ps1": "Vacant", "ps2": "Vacant", "ps3": "Occupied"},
+        reservations=ReservationBook(ttl=10, clock=Clock()),
+    )
+    zone.reservations.hold("ps2", "d1")
+
+    assert ParkingZoneManager.find_vacant_parking_spots(zone) == ["ps1"]
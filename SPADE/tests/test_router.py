@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+ParkingRouter = pytest.importorskip("parking_system.agents.ParkingRouter").ParkingRouter
+
+# Region centers about 11 km apart, and a third one further north
+NORTH = "north@isep.lan"
+SOUTH = "south@isep.lan"
+FAR = "far@isep.lan"
+
+
+def make_router():
+    router = ParkingRouter.__new__(ParkingRouter)
+    router.regions = {}
+    router.region_summaries = {}
+    router.add_region(NORTH, 41.20, -8.60)
+    router.add_region(SOUTH, 41.10, -8.60)
+    router.add_region(FAR, 41.50, -8.60)
+    return router
+
+
+def test_request_goes_to_owning_region():
+    router = make_router()
+    assert router.find_regions(41.19, -8.60) == [NORTH]
+
+
+def test_request_near_border_fans_out():
+    router = make_router()
+    assert sorted(router.find_regions(41.15, -8.60)) == [NORTH, SOUTH]
+
+
+def test_regions_without_vacancy_are_skipped():
+    router = make_router()
+    router.update_region_summary(SOUTH, 0, 0)
+    assert router.find_regions(41.15, -8.60) == [NORTH]
+
+
+def test_falls_back_to_nearest_vacant_region():
+    router = make_router()
+    router.update_region_summary(NORTH, 0, 0)
+    router.update_region_summary(SOUTH, 0, 0)
+    assert router.find_regions(41.19, -8.60) == [FAR]
+
+    router.update_region_summary(FAR, 0, 0)
+    assert router.find_regions(41.19, -8.60) == []
+
+
+def test_best_candidate_is_sent_to_driver():
+    behaviour = ParkingRouter.RouteBehaviour.__new__(ParkingRouter.RouteBehaviour)
+    behaviour.owner = make_router()
+    behaviour.pending = {"1": ("d1@isep.lan", float("inf"), {NORTH, SOUTH, FAR}, None)}
+    sent = []
+
+    async def send(msg):
+        sent.append(msg)
+
+    behaviour.send = send
+
+    async def answer_request():
+        await behaviour.process_candidate(NORTH, "Candidate 1 pz1@isep.lan 11")
+        await behaviour.process_candidate(SOUTH, "Candidate 1 pz2@isep.lan 12.5")
+        assert sent == []
+        await behaviour.process_candidate(FAR, "Candidate 1 None")
+
+    asyncio.run(answer_request())
+    assert [(str(msg.to), msg.body) for msg in sent] == [("d1@isep.lan", "pz2@isep.lan")]
+    assert behaviour.pending == {}
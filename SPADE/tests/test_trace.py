@@ -0,0 +1,65 @@
+import struct
+import time
+
+import pytest
+
+from parking_system.api import trace
+
+
+def test_records_round_trip(tmp_path):
+    path = tmp_path / "trace.bin"
+    recorder = trace.TraceRecorder(path)
+    recorder.record(trace.CREATE_ZONE, "pz1", "pm1", 41.17, -8.60, 2.5, "Outdoor")
+    recorder.record(trace.SONAR, "ps1", 35)
+    recorder.record(trace.DRIVER_REQUEST, "d1", 41.0, -8.0, "Outdoor", "Low")
+    recorder.close()
+
+    events = list(trace.read_trace(path))
+    assert [(event.kind, event.fields) for event in events] == [
+        (trace.CREATE_ZONE, ("pz1", "pm1", 41.17, -8.60, 2.5, "Outdoor")),
+        (trace.SONAR, ("ps1", 35)),
+        (trace.DRIVER_REQUEST, ("d1", 41.0, -8.0, "Outdoor", "Low")),
+    ]
+
+
+def test_records_are_flushed_before_close(tmp_path):
+    path = tmp_path / "trace.bin"
+    recorder = trace.TraceRecorder(path, flush_interval=0.01)
+    recorder.record(trace.SONAR, "ps1", 35)
+    time.sleep(0.1)
+    assert [event.fields for event in trace.read_trace(path)] == [("ps1", 35)]
+    recorder.close()
+
+
+def test_wide_values_are_recorded_or_skipped(tmp_path):
+    path = tmp_path / "trace.bin"
+    recorder = trace.TraceRecorder(path)
+    recorder.record(trace.SONAR, "p" * 300, 2 ** 40)
+    recorder.record(trace.SONAR, "ps1", 2 ** 70)
+    recorder.record(trace.CREATE_MANAGER, "m" * 70000)
+    recorder.close()
+    assert [event.fields for event in trace.read_trace(path)] == [("p" * 300, 2 ** 40)]
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    path = tmp_path / "trace.bin"
+    recorder = trace.TraceRecorder(path)
+    recorder.record(trace.SONAR, "ps1", 35)
+    recorder.close()
+    with open(path, "ab") as trace_file:
+        trace_file.write(b"\x00\x01")
+    assert len(list(trace.read_trace(path))) == 1
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "trace.bin"
+    path.write_bytes(b"not a trace")
+    with pytest.raises(ValueError):
+        list(trace.read_trace(path))
+
+
+def test_unknown_versions_are_rejected(tmp_path):
+    path = tmp_path / "trace.bin"
+    path.write_bytes(b"PKTR\x07" + struct.pack("<dB", 0.5, trace.SONAR))
+    with pytest.raises(ValueError):
+        list(trace.read_trace(path))